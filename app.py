@@ -3,19 +3,32 @@ RAG Chatbot Flask Application
 Modern web interface for university enrollment Q&A system
 """
 
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context, g
 from flask_cors import CORS
 import numpy as np
 import psycopg2
 import psycopg2.extras
 import os
+import json
+import math
+import random
 import time
+import threading
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
 import requests
-import glob
-from datetime import datetime
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Optional
+import hmac
 import secrets
+import uuid
+
+from src.file_catalog import CATALOG_EXTENSIONS, FileCatalog
+from src.ingestion import IngestionQueue
+from src.profiler import RequestProfiler
+from werkzeug.utils import secure_filename
 
 # Load environment variables
 load_dotenv('src/.env')
@@ -26,9 +39,45 @@ CORS(app)
 
 # Configuration
 DATA_FOLDER = "data"
+# Uploads wait here (one sub-directory per upload) until their job succeeds
+INGEST_STAGING_FOLDER = os.getenv('INGEST_STAGING_FOLDER', os.path.join(DATA_FOLDER, '.staging'))
+CATALOG_REFRESH_INTERVAL = float(os.getenv('CATALOG_REFRESH_INTERVAL', '30'))
+
+# Background ingestion: worker count, embedding batch size, CPU share kept for serving
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '1'))
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '32'))
+SERVING_CPU_SHARE = float(os.getenv('SERVING_CPU_SHARE', '0.5'))
+# /api/ingest requires INGEST_HEADER to carry INGEST_TOKEN (disabled when unset)
+INGEST_HEADER = os.getenv('INGEST_HEADER', 'X-Ingest-Token')
+INGEST_TOKEN = os.getenv('INGEST_TOKEN', '')
+# Opt-in sampling profiler: sampled fraction of requests, or requests whose
+# PROFILE_HEADER carries PROFILE_TOKEN (also required by /api/admin/profiles)
+PROFILE_ENABLED = os.getenv('PROFILE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0.01'))
+PROFILE_HEADER = os.getenv('PROFILE_HEADER', 'X-Profile')
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_MAX_FILE_MB = float(os.getenv('PROFILE_MAX_FILE_MB', '10'))
+
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('INGEST_MAX_UPLOAD_MB', '50')) * 1024 * 1024
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_URL = os.getenv('GROQ_URL', "https://api.groq.com/openai/v1/chat/completions")
 GROQ_MODEL = "llama-3.1-8b-instant"
+GROQ_TIMEOUT = float(os.getenv('GROQ_TIMEOUT', '15'))
+
+# Admission control for the LLM generation stage
+GENERATION_MAX_CONCURRENCY = int(os.getenv('GENERATION_MAX_CONCURRENCY', '4'))
+GENERATION_QUEUE_SIZE = int(os.getenv('GENERATION_QUEUE_SIZE', '8'))
+GENERATION_QUEUE_TIMEOUT = float(os.getenv('GENERATION_QUEUE_TIMEOUT', '5'))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30'))
+# Generation slots batch jobs can never take, kept for interactive /api/chat
+GENERATION_INTERACTIVE_RESERVED = int(os.getenv('GENERATION_INTERACTIVE_RESERVED', '2'))
+
+# Batch questions: max questions per request and concurrent LLM calls
+BATCH_MAX_QUESTIONS = int(os.getenv('BATCH_MAX_QUESTIONS', '100'))
+BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', '4'))
 
 DB_CONFIG = {
     'host': os.getenv('DB_HOST', 'localhost'),
@@ -40,11 +89,224 @@ DB_CONFIG = {
 
 db_connection_str = f"dbname={DB_CONFIG['dbname']} user={DB_CONFIG['user']} password={DB_CONFIG['password']} host={DB_CONFIG['host']} port={DB_CONFIG['port']}"
 
+# Data file metadata, built at ingest and refreshed only for changed files
+file_catalog = FileCatalog(DATA_FOLDER, db_connection_str, CATALOG_REFRESH_INTERVAL)
+
 # Initialize embedding model globally (singleton pattern)
 print("🔄 Loading embedding model...")
 embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
 print("✅ Embedding model loaded!")
 
+ingestion_queue = IngestionQueue(
+    embedding_model, db_connection_str, file_catalog, data_folder=DATA_FOLDER,
+    max_workers=INGEST_WORKERS, batch_size=INGEST_BATCH_SIZE, serving_cpu_share=SERVING_CPU_SHARE
+)
+
+
+# ========================
+# ADMISSION CONTROL
+# ========================
+
+class GenerationUnavailable(Exception):
+    """Raised when a generation request is shed instead of calling the LLM"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded, deadline-limited wait queue"""
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiting = 0
+        self._rejected = 0
+
+    @contextmanager
+    def admit(self):
+        """Hold a generation slot, waiting in the queue up to the deadline"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self._waiting >= self.max_queue:
+                    self._rejected += 1
+                    raise GenerationUnavailable("Generation queue is full", self.queue_timeout)
+                self._waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+            if not acquired:
+                with self._lock:
+                    self._rejected += 1
+                raise GenerationUnavailable("Timed out waiting for a generation slot", self.queue_timeout)
+        
+        with self._lock:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+            self._slots.release()
+
+    def has_capacity(self) -> bool:
+        """Cheap pre-check: False when a new request would be shed right away"""
+        with self._lock:
+            return self._active < self.max_concurrency or self._waiting < self.max_queue
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "active": self._active,
+                "waiting": self._waiting,
+                "rejected": self._rejected,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue
+            }
+
+
+class CircuitBreaker:
+    """Stop calling the upstream after repeated failures, probe again after a cool-down"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def before_call(self) -> bool:
+        """
+        Raise GenerationUnavailable if the upstream must not be called now.
+
+        Returns True when this call is the half-open probe; the caller must
+        then call release_probe() once done, whatever the outcome.
+        """
+        with self._lock:
+            if self._state == self.OPEN:
+                remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+                if remaining > 0:
+                    raise GenerationUnavailable("LLM upstream circuit is open", remaining)
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            
+            if self._state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    raise GenerationUnavailable("LLM upstream is being probed", self.reset_timeout)
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def release_probe(self):
+        """Free the probe slot if the probe ended without recording an outcome (e.g. it was shed)"""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit may be probed again (0 when calls are allowed)"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0
+            return max(0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"state": self._state, "failures": self._failures}
+
+
+generation_admission = AdmissionController(
+    GENERATION_MAX_CONCURRENCY, GENERATION_QUEUE_SIZE, GENERATION_QUEUE_TIMEOUT
+)
+llm_circuit = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+
+# All batch requests together hold at most this many generation slots
+BATCH_GENERATION_SLOTS = max(1, GENERATION_MAX_CONCURRENCY - GENERATION_INTERACTIVE_RESERVED)
+batch_generation_slots = threading.BoundedSemaphore(BATCH_GENERATION_SLOTS)
+
+
+# ========================
+# PROFILING
+# ========================
+
+request_profiler = RequestProfiler(
+    PROFILE_DIR, interval=PROFILE_INTERVAL_MS / 1000, max_file_bytes=int(PROFILE_MAX_FILE_MB * 1024 * 1024)
+)
+
+
+def has_header_token(header: str, token: str) -> bool:
+    """True if the request's `header` matches the configured `token` (never when unset)"""
+    if not token:
+        return False
+    # Compare bytes: compare_digest rejects non-ASCII str values
+    return hmac.compare_digest(
+        request.headers.get(header, '').encode('utf-8'), token.encode('utf-8')
+    )
+
+
+def has_profile_token() -> bool:
+    """True if the request's PROFILE_HEADER matches the configured PROFILE_TOKEN"""
+    return has_header_token(PROFILE_HEADER, PROFILE_TOKEN)
+
+
+def start_request_profile():
+    """Start sampling this request if it carries the token or falls in the sample"""
+    if random.random() < PROFILE_SAMPLE_RATE or has_profile_token():
+        g.profile_session = request_profiler.start(threading.get_ident())
+
+
+def finish_request_profile(response):
+    """Stop sampling when the response is closed (covers streamed bodies)"""
+    profile_session = g.pop('profile_session', None)
+    if profile_session is not None:
+        endpoint = request.endpoint or 'unknown'
+        method, path, status = request.method, request.path, response.status_code
+        response.call_on_close(
+            lambda: request_profiler.finish(profile_session, endpoint, method, path, status)
+        )
+    return response
+
+
+def discard_request_profile(exc=None):
+    """Fallback: stop a sampler left running if after_request never ran"""
+    profile_session = g.pop('profile_session', None)
+    if profile_session is not None:
+        profile_session.stop()
+
+
+# Hooks are only registered when enabled, so a disabled profiler costs nothing
+if PROFILE_ENABLED:
+    app.before_request(start_request_profile)
+    app.after_request(finish_request_profile)
+    app.teardown_request(discard_request_profile)
+
 
 # ========================
 # UTILITY FUNCTIONS
@@ -72,27 +334,93 @@ def cosine_distance(vec1: list[float], vec2: list[float]) -> float:
     return 1 - similarity
 
 
-def similar_corpus(input_corpus: str, top_k: int = 5) -> list[tuple]:
-    """Find similar corpus in database"""
+def parse_embedding(embedding) -> list[float]:
+    """Parse embedding if it's a string (from pgvector or FLOAT8[])"""
+    if isinstance(embedding, str):
+        if embedding.startswith('['):
+            embedding = [float(x) for x in embedding.strip('[]').split(',')]
+        elif embedding.startswith('{'):
+            embedding = [float(x) for x in embedding.strip('{}').split(',')]
+    return embedding
+
+
+def build_filter_clause(filters: Optional[dict]) -> tuple[str, list]:
+    """
+    Build a SQL WHERE clause from metadata filters.
+
+    Supported keys: file_names (list), file_type, date_from, date_to (ISO dates,
+    matched against the document dates). Each matches any of a deduplicated
+    chunk's source files.
+    Filters are applied in SQL so only matching rows are fetched and scored.
+    Raises ValueError on malformed filters.
+    """
+    if not filters:
+        return "", []
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object")
+    
+    unknown = set(filters) - {'file_names', 'file_type', 'date_from', 'date_to'}
+    if unknown:
+        raise ValueError(f"Unknown filter(s): {', '.join(sorted(unknown))}")
+    
+    conditions = []
+    params = []
+    
+    file_names = filters.get('file_names')
+    if file_names:
+        if isinstance(file_names, str):
+            file_names = [file_names]
+        if not isinstance(file_names, list) or not all(isinstance(f, str) for f in file_names):
+            raise ValueError("file_names must be a list of strings")
+        # source_files holds every file a deduplicated chunk came from
+        conditions.append("source_files && %s::text[]")
+        params.append(file_names)
+    
+    file_type = filters.get('file_type')
+    if file_type:
+        if not isinstance(file_type, str):
+            raise ValueError("file_type must be a string")
+        # source_types lists the type of every file a deduplicated chunk came from
+        conditions.append("source_types && %s::text[]")
+        params.append([file_type.lower().lstrip('.')])
+    
+    # Dates scope the documents (file dates stored at ingest), not the insertion
+    # time; both bounds must hold for the same source file
+    date_bounds = []
+    for key, operator in (('date_from', '>='), ('date_to', '<=')):
+        value = filters.get(key)
+        if value:
+            try:
+                parsed = date.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{key} must be an ISO date (YYYY-MM-DD)")
+            date_bounds.append(f"source_date {operator} %s")
+            params.append(parsed)
+    if date_bounds:
+        conditions.append(
+            "EXISTS (SELECT 1 FROM unnest(source_dates) AS source_date WHERE " + " AND ".join(date_bounds) + ")"
+        )
+    
+    if not conditions:
+        return "", []
+    return " WHERE " + " AND ".join(conditions), params
+
+
+def similar_corpus(input_corpus: str, top_k: int = 5, filters: Optional[dict] = None) -> list[tuple]:
+    """Find similar corpus in database, optionally restricted by metadata filters"""
+    where_clause, params = build_filter_clause(filters)
     input_embedding = embedding_model.encode(input_corpus, convert_to_numpy=True).tolist()
     
     with psycopg2.connect(db_connection_str) as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT id, corpus, embedding FROM embeddings")
+            cur.execute("SELECT id, corpus, embedding FROM embeddings" + where_clause, params)
             all_results = cur.fetchall()
             
             results_with_distance = []
             for row in all_results:
                 id = row[0]
                 corpus = row[1]
-                embedding = row[2]
-                
-                # Parse embedding if it's a string (from pgvector or FLOAT8[])
-                if isinstance(embedding, str):
-                    if embedding.startswith('['):
-                        embedding = [float(x) for x in embedding.strip('[]').split(',')]
-                    elif embedding.startswith('{'):
-                        embedding = [float(x) for x in embedding.strip('{}').split(',')]
+                embedding = parse_embedding(row[2])
                 
                 distance = cosine_distance(input_embedding, embedding)
                 results_with_distance.append((distance, id, corpus))
@@ -101,6 +429,50 @@ def similar_corpus(input_corpus: str, top_k: int = 5) -> list[tuple]:
             return [(id, corpus, 1-distance) for distance, id, corpus in results_with_distance[:top_k]]
 
 
+def similar_corpus_batch(input_corpora: list[str], top_k: int = 5, filters: Optional[dict] = None) -> list[list[tuple]]:
+    """Find similar corpus for several queries with one encode call and one matrix product"""
+    if not input_corpora:
+        return []
+    
+    where_clause, params = build_filter_clause(filters)
+    query_matrix = embedding_model.encode(input_corpora, convert_to_numpy=True)
+    
+    with psycopg2.connect(db_connection_str) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id, corpus, embedding FROM embeddings" + where_clause, params)
+            all_results = cur.fetchall()
+    
+    if not all_results:
+        return [[] for _ in input_corpora]
+    
+    ids = [row[0] for row in all_results]
+    corpora = [row[1] for row in all_results]
+    corpus_matrix = np.array([parse_embedding(row[2]) for row in all_results], dtype=np.float32)
+    
+    # Normalize rows so the dot product is the cosine similarity (zero vectors score 0)
+    query_norms = np.linalg.norm(query_matrix, axis=1, keepdims=True)
+    corpus_norms = np.linalg.norm(corpus_matrix, axis=1, keepdims=True)
+    query_matrix = np.divide(query_matrix, query_norms, out=np.zeros_like(query_matrix), where=query_norms != 0)
+    corpus_matrix = np.divide(corpus_matrix, corpus_norms, out=np.zeros_like(corpus_matrix), where=corpus_norms != 0)
+    
+    similarities = query_matrix @ corpus_matrix.T
+    
+    k = min(top_k, len(ids))
+    if k <= 0:
+        return [[] for _ in input_corpora]
+    
+    # Top-k per row without a full sort, then order the k candidates
+    top_indices = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    batch_results = []
+    for row_idx, candidates in enumerate(top_indices):
+        ordered = candidates[np.argsort(-similarities[row_idx, candidates])]
+        batch_results.append([
+            (ids[i], corpora[i], float(similarities[row_idx, i]))
+            for i in ordered
+        ])
+    return batch_results
+
+
 def generate_response(query: str, context: list[str]) -> dict:
     """Generate response using Groq LLM"""
     prompt = f"""Tu es un assistant spécialisé dans l'analyse de conversations universitaires.
@@ -113,26 +485,46 @@ Question: {query}
 Réponse détaillée et structurée en français:"""
     
     try:
-        start_time = time.time()
-        
-        response = requests.post(
-            GROQ_URL,
-            headers={
-                "Authorization": f"Bearer {GROQ_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": GROQ_MODEL,
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.7,
-                "max_tokens": 500
-            },
-            timeout=15
-        )
-        response.raise_for_status()
-        
-        result = response.json()
-        elapsed = time.time() - start_time
+        is_probe = llm_circuit.before_call()
+        try:
+            with generation_admission.admit():
+                start_time = time.time()
+                
+                try:
+                    response = requests.post(
+                        GROQ_URL,
+                        headers={
+                            "Authorization": f"Bearer {GROQ_API_KEY}",
+                            "Content-Type": "application/json"
+                        },
+                        json={
+                            "model": GROQ_MODEL,
+                            "messages": [{"role": "user", "content": prompt}],
+                            "temperature": 0.7,
+                            "max_tokens": 500
+                        },
+                        timeout=GROQ_TIMEOUT
+                    )
+                    response.raise_for_status()
+                except requests.exceptions.HTTPError as e:
+                    # Client errors (bad key, bad payload) say nothing about upstream health
+                    if e.response.status_code >= 500 or e.response.status_code == 429:
+                        llm_circuit.record_failure()
+                    else:
+                        llm_circuit.record_success()
+                    raise
+                except requests.exceptions.RequestException:
+                    llm_circuit.record_failure()
+                    raise
+                
+                llm_circuit.record_success()
+                result = response.json()
+                elapsed = time.time() - start_time
+        finally:
+            # A probe shed by admission control (or failing before an outcome
+            # is recorded) must not keep the circuit half-open forever
+            if is_probe:
+                llm_circuit.release_probe()
         
         return {
             "success": True,
@@ -140,12 +532,94 @@ Réponse détaillée et structurée en français:"""
             "time": round(elapsed, 2)
         }
         
+    except GenerationUnavailable as e:
+        return {"success": False, "error": str(e), "retry_after": e.retry_after}
     except requests.exceptions.HTTPError as e:
         return {"success": False, "error": f"HTTP Error: {e.response.status_code}"}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
+def format_sources(results: list[tuple]) -> list[dict]:
+    """Format retrieval results as API sources"""
+    return [
+        {
+            "id": id,
+            "text": corpus[:200] + "..." if len(corpus) > 200 else corpus,
+            "relevance": round(relevance * 100, 1)
+        }
+        for id, corpus, relevance in results
+    ]
+
+
+def generate_batch_response(query: str, context: list[str], cancelled: threading.Event) -> dict:
+    """generate_response for batch items, limited to the batch share of generation slots"""
+    with batch_generation_slots:
+        # The client may have gone away while this item waited for a slot
+        if cancelled.is_set():
+            return {"success": False, "error": "Batch cancelled"}
+        return generate_response(query, context)
+
+
+def answer_questions_batch(questions: list[str], top_k: int = 5, max_workers: int = BATCH_MAX_WORKERS,
+                           filters: Optional[dict] = None):
+    """
+    Answer many questions in bulk.
+
+    Embeddings and retrieval are done once for the whole batch, then LLM calls
+    are fanned out over a bounded thread pool. Yields one result dict per
+    question as soon as it finishes; failures are reported per item.
+    """
+    try:
+        batch_results = similar_corpus_batch(questions, top_k=top_k, filters=filters)
+    except Exception as e:
+        for index, question in enumerate(questions):
+            yield {"index": index, "question": question, "status": "error", "error": str(e)}
+        return
+    
+    cancelled = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    completed = False
+    try:
+        futures = {
+            executor.submit(
+                generate_batch_response, question, [corpus for _, corpus, _ in results], cancelled
+            ): index
+            for index, (question, results) in enumerate(zip(questions, batch_results))
+        }
+        
+        for future in as_completed(futures):
+            index = futures[future]
+            item = {"index": index, "question": questions[index]}
+            try:
+                response = future.result()
+            except Exception as e:
+                response = {"success": False, "error": str(e)}
+            
+            if response["success"]:
+                sources = format_sources(batch_results[index])
+                item.update({
+                    "status": "success",
+                    "answer": response["answer"],
+                    "sources": sources,
+                    "response_time": response["time"],
+                    "sources_count": len(sources)
+                })
+            else:
+                item.update({"status": "error", "error": response.get("error", "Unknown error")})
+                if "retry_after" in response:
+                    item["retry_after"] = response["retry_after"]
+            yield item
+        completed = True
+    finally:
+        if not completed:
+            # Generator closed early (client disconnected): drop pending LLM calls
+            cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            executor.shutdown()
+
+
 # ========================
 # DATABASE STATS FUNCTIONS
 # ========================
@@ -211,40 +685,25 @@ def get_database_stats():
 
 
 def get_data_files_info():
-    """Get information about data files"""
+    """Get information about data files (from the file catalog)"""
     try:
-        txt_files = glob.glob(os.path.join(DATA_FOLDER, "*.txt"))
+        txt_files = file_catalog.files(file_type='txt')
         
-        files_info = []
-        total_lines = 0
-        
-        for file_path in txt_files:
-            file_name = os.path.basename(file_path)
-            file_size = os.path.getsize(file_path)
-            
-            # Count lines
-            encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-            lines = 0
-            for encoding in encodings:
-                try:
-                    with open(file_path, 'r', encoding=encoding) as f:
-                        lines = len(f.readlines())
-                    break
-                except:
-                    continue
-            
-            total_lines += lines
-            
-            files_info.append({
-                "name": file_name,
-                "size_kb": round(file_size / 1024, 2),
-                "lines": lines
-            })
+        files_info = [
+            {
+                "name": f['file_name'],
+                "size_kb": round(f['size_bytes'] / 1024, 2),
+                "lines": f['line_count'] or 0,
+                "encoding": f['encoding'],
+                "chunks": f['chunk_count']
+            }
+            for f in txt_files
+        ]
         
         return {
             "success": True,
             "total_files": len(txt_files),
-            "total_lines": total_lines,
+            "total_lines": sum(f['lines'] for f in files_info),
             "files": sorted(files_info, key=lambda x: x['size_kb'], reverse=True)
         }
     except Exception as e:
@@ -295,24 +754,34 @@ def chat():
     data = request.json
     query = data.get('question', data.get('query', ''))
     top_k = data.get('top_k', 5)
+    filters = data.get('filters')
     
     if not query:
         return jsonify({"status": "error", "error": "Question is required"}), 400
+    try:
+        build_filter_clause(filters)
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+    
+    # Skip retrieval entirely while the LLM upstream is known to be down
+    retry_after = llm_circuit.retry_after()
+    if retry_after:
+        return jsonify({"status": "error", "error": "LLM upstream circuit is open"}), 503, {
+            "Retry-After": str(max(1, math.ceil(retry_after)))
+        }
+    # ... or while the generation queue is already full
+    if not generation_admission.has_capacity():
+        return jsonify({"status": "error", "error": "Generation queue is full"}), 503, {
+            "Retry-After": str(max(1, math.ceil(GENERATION_QUEUE_TIMEOUT)))
+        }
     
     try:
         # Find similar corpus
-        results = similar_corpus(query, top_k=top_k)
+        results = similar_corpus(query, top_k=top_k, filters=filters)
         
         # Extract context
         context = [corpus for _, corpus, _ in results]
-        sources = [
-            {
-                "id": id,
-                "text": corpus[:200] + "..." if len(corpus) > 200 else corpus,
-                "relevance": round(relevance * 100, 1)
-            }
-            for id, corpus, relevance in results
-        ]
+        sources = format_sources(results)
         
         # Generate response
         response = generate_response(query, context)
@@ -335,6 +804,11 @@ def chat():
                 "response_time": response["time"],
                 "sources_count": len(sources)
             })
+        elif "retry_after" in response:
+            # Load shed: fail fast so the worker is freed for other requests
+            return jsonify({"status": "error", "error": response["error"]}), 503, {
+                "Retry-After": str(response["retry_after"])
+            }
         else:
             return jsonify({"status": "error", "error": response.get("error", "Unknown error")}), 500
             
@@ -342,6 +816,34 @@ def chat():
         return jsonify({"status": "error", "error": str(e)}), 500
 
 
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """Answer a list of questions, streaming one NDJSON line per question as it finishes"""
+    data = request.json or {}
+    questions = data.get('questions', [])
+    top_k = data.get('top_k', 5)
+    filters = data.get('filters')
+    
+    if not isinstance(questions, list) or not questions:
+        return jsonify({"status": "error", "error": "A non-empty 'questions' list is required"}), 400
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return jsonify({"status": "error", "error": f"At most {BATCH_MAX_QUESTIONS} questions per batch"}), 400
+    if not all(isinstance(q, str) and q.strip() for q in questions):
+        return jsonify({"status": "error", "error": "Every question must be a non-empty string"}), 400
+    if not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1:
+        return jsonify({"status": "error", "error": "top_k must be a positive integer"}), 400
+    try:
+        build_filter_clause(filters)
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+    
+    def generate():
+        for item in answer_questions_batch(questions, top_k=top_k, filters=filters):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
 @app.route('/api/stats', methods=['GET'])
 def stats():
     """Get database statistics"""
@@ -352,8 +854,9 @@ def stats():
                 cur.execute("SELECT COUNT(*) FROM embeddings")
                 total_records = cur.fetchone()[0]
                 
-                # Count unique files from data folder
-                unique_files = len(glob.glob(os.path.join(DATA_FOLDER, "*.txt")))
+                # Count unique files from the data file catalog
+                txt_files = file_catalog.files(file_type='txt')
+                unique_files = len(txt_files)
                 
                 # Average corpus length
                 cur.execute("SELECT AVG(LENGTH(corpus)) FROM embeddings")
@@ -377,14 +880,9 @@ def stats():
                 length_dist = cur.fetchall()
                 length_distribution = {cat: cnt for cat, cnt in length_dist}
                 
-                # File distribution - use data folder files
-                file_distribution = {}
-                txt_files = glob.glob(os.path.join(DATA_FOLDER, "*.txt"))
-                for i, file_path in enumerate(txt_files[:10], 1):
-                    file_name = os.path.basename(file_path)
-                    # Estimate records per file (total / number of files)
-                    estimated_count = total_records // len(txt_files) if txt_files else 0
-                    file_distribution[file_name] = estimated_count
+                # File distribution - chunk counts recorded in the catalog at ingest
+                top_files = sorted(txt_files, key=lambda f: f['chunk_count'], reverse=True)[:10]
+                file_distribution = {f['file_name']: f['chunk_count'] for f in top_files}
                 
                 return jsonify({
                     "status": "success",
@@ -439,12 +937,17 @@ def semantic_search():
     data = request.json
     query = data.get('query', '')
     top_k = data.get('top_k', 10)
+    filters = data.get('filters')
     
     if not query:
         return jsonify({"success": False, "error": "Query is required"}), 400
+    try:
+        build_filter_clause(filters)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     
     try:
-        results = similar_corpus(query, top_k=top_k)
+        results = similar_corpus(query, top_k=top_k, filters=filters)
         
         return jsonify({
             "success": True,
@@ -461,6 +964,89 @@ def semantic_search():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+def has_ingest_token() -> bool:
+    """True if the request's INGEST_HEADER matches the configured INGEST_TOKEN"""
+    return has_header_token(INGEST_HEADER, INGEST_TOKEN)
+
+
+def ingest_forbidden():
+    """403 response for /api/ingest calls without a valid token"""
+    if not INGEST_TOKEN:
+        return jsonify({"success": False, "error": "Ingestion is disabled (set INGEST_TOKEN)"}), 403
+    return jsonify({"success": False, "error": f"A valid {INGEST_HEADER} token is required"}), 403
+
+
+@app.route('/api/ingest', methods=['POST'])
+def ingest():
+    """Upload .txt/.pdf files and queue them for background ingestion"""
+    if not has_ingest_token():
+        return ingest_forbidden()
+    
+    uploads = request.files.getlist('files')
+    if not uploads:
+        return jsonify({"success": False, "error": "At least one file is required in 'files'"}), 400
+    
+    file_names = []
+    for upload in uploads:
+        file_name = secure_filename(upload.filename or '')
+        if os.path.splitext(file_name)[1].lower() not in CATALOG_EXTENSIONS:
+            return jsonify({
+                "success": False,
+                "error": f"Unsupported file '{upload.filename}' (allowed: {', '.join(CATALOG_EXTENSIONS)})"
+            }), 400
+        file_names.append(file_name)
+    
+    # Stage the upload: data/ only receives the files once their job succeeds,
+    # so a failed job leaves nothing behind and a re-upload never overwrites
+    # a file a running job is still reading
+    staging_dir = os.path.join(INGEST_STAGING_FOLDER, uuid.uuid4().hex)
+    os.makedirs(staging_dir)
+    file_paths = []
+    for upload, file_name in zip(uploads, file_names):
+        file_path = os.path.join(staging_dir, file_name)
+        upload.save(file_path)
+        file_paths.append(file_path)
+    
+    job_id = ingestion_queue.submit(file_paths)
+    return jsonify({"success": True, "job": ingestion_queue.get(job_id)}), 202
+
+
+@app.route('/api/ingest', methods=['GET'])
+def ingest_jobs():
+    """List recent ingestion jobs"""
+    if not has_ingest_token():
+        return ingest_forbidden()
+    return jsonify({"success": True, "jobs": ingestion_queue.jobs()})
+
+
+@app.route('/api/ingest/<job_id>', methods=['GET'])
+def ingest_status(job_id):
+    """Status of one ingestion job"""
+    if not has_ingest_token():
+        return ingest_forbidden()
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, "job": job})
+
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def admin_profiles():
+    """Slowest recently profiled requests"""
+    if not PROFILE_ENABLED:
+        return jsonify({"success": False, "error": "Profiling is disabled (set PROFILE_ENABLED=true)"}), 404
+    if not has_profile_token():
+        return jsonify({"success": False, "error": f"A valid {PROFILE_HEADER} token is required"}), 403
+    
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({
+        "success": True,
+        "sample_rate": PROFILE_SAMPLE_RATE,
+        "output_dir": PROFILE_DIR,
+        "profiles": request_profiler.slowest(limit)
+    })
+
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
@@ -474,6 +1060,10 @@ def health():
             "status": "healthy",
             "database": "connected",
             "model": "loaded",
+            "generation": {
+                "admission": generation_admission.snapshot(),
+                "circuit": llm_circuit.snapshot()
+            },
             "timestamp": datetime.now().isoformat()
         })
     except Exception as e:
@@ -7,6 +7,8 @@ from pathlib import Path
 from sentence_transformers import SentenceTransformer
 import PyPDF2
 import glob
+from file_catalog import document_date, write_catalog
+from dedup import deduplicate_chunks
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -53,7 +55,8 @@ def load_data_from_folder(data_folder="data"):
                             documents.append({
                                 'file': os.path.basename(txt_file),
                                 'content': content,
-                                'type': 'txt'
+                                'type': 'txt',
+                                'date': document_date(txt_file)
                             })
                         break
                 except UnicodeDecodeError:
@@ -69,7 +72,8 @@ def load_data_from_folder(data_folder="data"):
             documents.append({
                 'file': os.path.basename(pdf_file),
                 'content': content,
-                'type': 'pdf'
+                'type': 'pdf',
+                'date': document_date(pdf_file)
             })
     
     return documents
@@ -127,6 +131,10 @@ def create_database():
                 embedding VECTOR(384),
                 file_name VARCHAR(255),
                 file_type VARCHAR(10),
+                source_files TEXT[],
+                source_types TEXT[],
+                source_dates DATE[],
+                document_date DATE,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
@@ -139,6 +147,14 @@ def create_database():
         """)
         print("✅ HNSW index created!")
         
+        # Index des métadonnées pour les recherches filtrées (pré-filtrage avant le scoring)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS embeddings_file_name_idx ON embeddings (file_name);
+            CREATE INDEX IF NOT EXISTS embeddings_source_files_idx ON embeddings USING gin (source_files);
+            CREATE INDEX IF NOT EXISTS embeddings_source_types_idx ON embeddings USING gin (source_types);
+        """)
+        print("✅ Metadata indexes created!")
+        
         conn.commit()
         
         # Charger les données depuis data/
@@ -152,33 +168,50 @@ def create_database():
         print(f"   - {txt_count} .txt files")
         print(f"   - {pdf_count} .pdf files")
         
-        # Insérer les embeddings
-        print("\n🔄 Generating embeddings and inserting into database...")
-        total_inserted = 0
-        
+        # Découper les documents en chunks
+        chunks = []
         for doc in documents:
-            # Diviser en chunks si nécessaire
             content = doc['content']
-            chunks = [content[i:i+500] for i in range(0, len(content), 500)]
-            
-            for chunk in chunks:
+            for i in range(0, len(content), 500):
+                chunk = content[i:i+500]
                 if chunk.strip():
-                    # Générer embedding
-                    embedding = model.encode(chunk).tolist()
-                    
-                    # Insérer dans la DB
-                    cursor.execute(
-                        """
-                        INSERT INTO embeddings (corpus, embedding, file_name, file_type)
-                        VALUES (%s, %s, %s, %s)
-                        """,
-                        (chunk, embedding, doc['file'], doc['type'])
-                    )
-                    total_inserted += 1
+                    chunks.append({'text': chunk, 'file': doc['file'], 'type': doc['type'], 'date': doc['date']})
+        
+        # Générer tous les embeddings en un seul appel
+        print(f"\n🔄 Generating embeddings for {len(chunks)} chunks...")
+        embeddings = model.encode([c['text'] for c in chunks], convert_to_numpy=True)
+        
+        # Supprimer les quasi-doublons (en-têtes OCR, PDF recopiés en .txt...)
+        chunks, embeddings, removed = deduplicate_chunks(chunks, embeddings)
+        print(f"🧹 Removed {removed} near-duplicate chunks ({len(chunks)} kept)")
+        
+        # Insérer les embeddings
+        print("\n🔄 Inserting into database...")
+        total_inserted = 0
+        chunk_counts = {}
+        
+        for chunk, embedding in zip(chunks, embeddings):
+            cursor.execute(
+                """
+                INSERT INTO embeddings
+                    (corpus, embedding, file_name, file_type, document_date, source_files, source_types, source_dates)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """,
+                (chunk['text'], embedding.tolist(), chunk['file'], chunk['type'], chunk['date'],
+                 chunk['source_files'], chunk['source_types'], chunk['source_dates'])
+            )
+            total_inserted += 1
+            for source_file in chunk['source_files']:
+                chunk_counts[source_file] = chunk_counts.get(source_file, 0) + 1
         
         conn.commit()
         print(f"✅ Inserted {total_inserted} embeddings into database!")
         
+        # Catalogue des fichiers (encodage, lignes, taille, chunks) pour /api/stats
+        write_catalog(cursor, data_path, chunk_counts)
+        conn.commit()
+        print("✅ Data file catalog updated!")
+        
         cursor.close()
         conn.close()
         
@@ -0,0 +1,167 @@
+"""
+Near-Duplicate Chunk Elimination
+MinHash/LSH on chunk text finds candidate pairs, an embedding cosine check
+confirms them, and each cluster is collapsed into one canonical chunk that
+keeps back-references to all its source files. New chunks can also be
+matched against rows already in the index
+"""
+
+import re
+import zlib
+import numpy as np
+
+
+NUM_PERM = 64
+LSH_BANDS = 16
+SHINGLE_SIZE = 5
+JACCARD_THRESHOLD = 0.7
+COSINE_THRESHOLD = 0.95
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, (1 << 32) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, (1 << 32) - 1, size=NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text, k=SHINGLE_SIZE):
+    """Hashed character k-grams of the normalized text"""
+    normalized = re.sub(r'\s+', ' ', text.lower()).strip()
+    if len(normalized) <= k:
+        return {zlib.crc32(normalized.encode('utf-8'))}
+    return {
+        zlib.crc32(normalized[i:i + k].encode('utf-8'))
+        for i in range(len(normalized) - k + 1)
+    }
+
+
+def minhash_signature(text):
+    """MinHash signature (NUM_PERM values) of the text's shingle set"""
+    hashes = np.fromiter(shingles(text), dtype=np.uint64)
+    # Universal hashing h(x) = (a*x + b) mod p, one row per permutation
+    permuted = np.bitwise_and(
+        (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME, _MAX_HASH
+    )
+    return permuted.min(axis=1)
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def deduplicate_chunks(chunks, embeddings,
+                       jaccard_threshold=JACCARD_THRESHOLD, cosine_threshold=COSINE_THRESHOLD):
+    """
+    Collapse near-duplicate chunks.
+
+    `chunks` is a list of dicts with 'text', 'file', 'type' and 'date';
+    `embeddings` the matching (n, dim) array. Returns (kept_chunks,
+    kept_embeddings, removed_count). Each kept chunk gets aligned
+    'source_files' / 'source_types' / 'source_dates' lists covering every
+    file of its cluster (canonical first); the longest chunk of a cluster is
+    the canonical one.
+    """
+    n = len(chunks)
+    if n == 0:
+        return [], embeddings, 0
+
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    unit = np.divide(embeddings, norms, out=np.zeros_like(embeddings), where=norms != 0)
+
+    signatures = np.array([minhash_signature(chunk['text']) for chunk in chunks])
+    rows_per_band = NUM_PERM // LSH_BANDS
+
+    # LSH: chunks sharing any band bucket are candidate pairs
+    candidates = set()
+    for band in range(LSH_BANDS):
+        buckets = {}
+        band_slice = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        for i in range(n):
+            buckets.setdefault(band_slice[i].tobytes(), []).append(i)
+        for members in buckets.values():
+            for a in range(len(members)):
+                for b in range(a + 1, len(members)):
+                    candidates.add((members[a], members[b]))
+
+    parent = list(range(n))
+    for i, j in candidates:
+        estimated_jaccard = np.mean(signatures[i] == signatures[j])
+        if estimated_jaccard < jaccard_threshold:
+            continue
+        if float(unit[i] @ unit[j]) < cosine_threshold:
+            continue
+        root_i, root_j = _find(parent, i), _find(parent, j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    clusters = {}
+    for i in range(n):
+        clusters.setdefault(_find(parent, i), []).append(i)
+
+    kept_indices = []
+    kept_chunks = []
+    for members in sorted(clusters.values(), key=lambda m: m[0]):
+        canonical = max(members, key=lambda i: (len(chunks[i]['text']), -i))
+        # One entry per source file, aligned across files / types / dates
+        source_files, source_types, source_dates = [], [], []
+        for i in [canonical] + [m for m in members if m != canonical]:
+            if chunks[i]['file'] not in source_files:
+                source_files.append(chunks[i]['file'])
+                source_types.append(chunks[i]['type'])
+                source_dates.append(chunks[i]['date'])
+        kept_indices.append(canonical)
+        kept_chunks.append(dict(
+            chunks[canonical],
+            source_files=source_files, source_types=source_types, source_dates=source_dates
+        ))
+
+    return kept_chunks, embeddings[kept_indices], n - len(kept_chunks)
+
+
+def match_existing(chunks, embeddings, existing_ids, existing_embeddings, existing_texts_for,
+                   jaccard_threshold=JACCARD_THRESHOLD, cosine_threshold=COSINE_THRESHOLD, block_size=256):
+    """
+    Match new chunks against rows already in the index.
+
+    The top-1 existing row by embedding cosine is a candidate when it reaches
+    `cosine_threshold`; `existing_texts_for(ids)` then fetches those rows'
+    text for the MinHash check. Returns, for each new chunk, the id of the
+    existing row it duplicates, or None.
+    """
+    matches = [None] * len(chunks)
+    if not chunks or not existing_ids:
+        return matches
+
+    def normalize(matrix):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms != 0)
+
+    new_unit = normalize(embeddings)
+    existing_unit = normalize(existing_embeddings)
+
+    candidates = {}
+    for start in range(0, len(chunks), block_size):
+        similarities = new_unit[start:start + block_size] @ existing_unit.T
+        best = similarities.argmax(axis=1)
+        for offset, row in enumerate(best):
+            if similarities[offset, row] >= cosine_threshold:
+                candidates[start + offset] = existing_ids[row]
+
+    if not candidates:
+        return matches
+
+    texts = existing_texts_for(sorted(set(candidates.values())))
+    for i, existing_id in candidates.items():
+        existing_text = texts.get(existing_id)
+        if existing_text is None:
+            continue
+        estimated_jaccard = np.mean(minhash_signature(chunks[i]['text']) == minhash_signature(existing_text))
+        if estimated_jaccard >= jaccard_threshold:
+            matches[i] = existing_id
+    return matches
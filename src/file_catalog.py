@@ -0,0 +1,214 @@
+"""
+Data File Catalog
+Keeps per-file metadata (encoding, lines, size, chunk count) for data/
+in the data_files table, so stats don't re-read every file on each request
+"""
+
+import os
+import threading
+import time
+from datetime import date
+import psycopg2
+
+
+ENCODINGS = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+CATALOG_EXTENSIONS = {'.txt': 'txt', '.pdf': 'pdf'}
+
+CREATE_CATALOG_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS data_files (
+        file_name VARCHAR(255) PRIMARY KEY,
+        file_type VARCHAR(10),
+        encoding VARCHAR(20),
+        line_count INTEGER,
+        size_bytes BIGINT,
+        mtime DOUBLE PRECISION,
+        chunk_count INTEGER DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Refresh only touches file metadata: chunk_count belongs to ingestion
+UPSERT_FILE_SQL = """
+    INSERT INTO data_files (file_name, file_type, encoding, line_count, size_bytes, mtime)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON CONFLICT (file_name) DO UPDATE SET
+        file_type = EXCLUDED.file_type,
+        encoding = EXCLUDED.encoding,
+        line_count = EXCLUDED.line_count,
+        size_bytes = EXCLUDED.size_bytes,
+        mtime = EXCLUDED.mtime,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def read_text_file(file_path):
+    """Read a text file trying several encodings, return (content, encoding)"""
+    for encoding in ENCODINGS:
+        try:
+            with open(file_path, 'r', encoding=encoding) as f:
+                return f.read(), encoding
+        except UnicodeDecodeError:
+            continue
+    return None, None
+
+
+def document_date(file_path):
+    """Date of a document, taken from the file's modification time"""
+    return date.fromtimestamp(os.path.getmtime(file_path))
+
+
+def count_lines(content):
+    """Same count as len(f.readlines())"""
+    if not content:
+        return 0
+    return content.count('\n') + (0 if content.endswith('\n') else 1)
+
+
+def scan_file(file_path, stat=None):
+    """Build the catalog entry for one data file"""
+    stat = stat or os.stat(file_path)
+    file_type = CATALOG_EXTENSIONS[os.path.splitext(file_path)[1].lower()]
+
+    encoding, line_count = None, None
+    if file_type == 'txt':
+        content, encoding = read_text_file(file_path)
+        line_count = count_lines(content)
+
+    return {
+        'file_name': os.path.basename(file_path),
+        'file_type': file_type,
+        'encoding': encoding,
+        'line_count': line_count,
+        'size_bytes': stat.st_size,
+        'mtime': stat.st_mtime,
+        'chunk_count': 0
+    }
+
+
+def list_data_files(data_folder):
+    """Yield (path, stat) for every catalogued file in data_folder"""
+    with os.scandir(data_folder) as entries:
+        for entry in entries:
+            if entry.is_file() and os.path.splitext(entry.name)[1].lower() in CATALOG_EXTENSIONS:
+                yield entry.path, entry.stat()
+
+
+def write_catalog(cursor, data_folder, chunk_counts):
+    """Rebuild the whole catalog at ingest time, with the chunk count of each file"""
+    cursor.execute(CREATE_CATALOG_TABLE_SQL)
+    cursor.execute("DELETE FROM data_files")
+
+    for file_path, stat in list_data_files(data_folder):
+        entry = scan_file(file_path, stat)
+        cursor.execute(
+            """
+            INSERT INTO data_files (file_name, file_type, encoding, line_count, size_bytes, mtime, chunk_count)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """,
+            (entry['file_name'], entry['file_type'], entry['encoding'], entry['line_count'],
+             entry['size_bytes'], entry['mtime'], chunk_counts.get(entry['file_name'], 0))
+        )
+
+
+class FileCatalog:
+    """
+    In-memory view of the data_files table.
+
+    At most once per refresh_interval, data/ is listed, only files whose
+    mtime or size changed are re-read, and chunk counts are reloaded from the
+    table; between refreshes reads are served from memory.
+    """
+
+    def __init__(self, data_folder, connection_str, refresh_interval=30.0):
+        self.data_folder = data_folder
+        self.connection_str = connection_str
+        self.refresh_interval = refresh_interval
+        self._entries = {}
+        self._loaded = False
+        self._last_refresh = None
+        self._lock = threading.Lock()
+
+    def _load(self, cur):
+        cur.execute(CREATE_CATALOG_TABLE_SQL)
+        cur.execute(
+            "SELECT file_name, file_type, encoding, line_count, size_bytes, mtime, chunk_count FROM data_files"
+        )
+        self._entries = {
+            row[0]: {
+                'file_name': row[0],
+                'file_type': row[1],
+                'encoding': row[2],
+                'line_count': row[3],
+                'size_bytes': row[4],
+                'mtime': row[5],
+                'chunk_count': row[6] or 0
+            }
+            for row in cur.fetchall()
+        }
+        self._loaded = True
+
+    def refresh(self, force=False):
+        """Sync the catalog with data/, re-reading only changed files"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_refresh is not None and now - self._last_refresh < self.refresh_interval:
+                return
+
+            with psycopg2.connect(self.connection_str) as conn:
+                with conn.cursor() as cur:
+                    if not self._loaded:
+                        self._load(cur)
+
+                    seen = set()
+                    for file_path, stat in list_data_files(self.data_folder):
+                        name = os.path.basename(file_path)
+                        seen.add(name)
+                        cached = self._entries.get(name)
+                        if cached and cached['mtime'] == stat.st_mtime and cached['size_bytes'] == stat.st_size:
+                            continue
+
+                        entry = scan_file(file_path, stat)
+                        entry['chunk_count'] = cached['chunk_count'] if cached else 0
+                        cur.execute(UPSERT_FILE_SQL, (
+                            entry['file_name'], entry['file_type'], entry['encoding'],
+                            entry['line_count'], entry['size_bytes'], entry['mtime']
+                        ))
+                        self._entries[name] = entry
+
+                    removed = [name for name in self._entries if name not in seen]
+                    if removed:
+                        cur.execute("DELETE FROM data_files WHERE file_name = ANY(%s)", (removed,))
+                        for name in removed:
+                            del self._entries[name]
+
+                    # Chunk counts are written by ingestion (create_db.py or
+                    # /api/ingest), possibly by another process: always reload them
+                    cur.execute("SELECT file_name, chunk_count FROM data_files")
+                    for name, chunk_count in cur.fetchall():
+                        if name in self._entries:
+                            self._entries[name]['chunk_count'] = chunk_count or 0
+
+            self._last_refresh = now
+
+    def set_chunk_counts(self, chunk_counts):
+        """Record chunk counts after an incremental ingestion"""
+        self.refresh(force=True)
+        with self._lock:
+            with psycopg2.connect(self.connection_str) as conn:
+                with conn.cursor() as cur:
+                    for file_name, count in chunk_counts.items():
+                        cur.execute(
+                            "UPDATE data_files SET chunk_count = %s, updated_at = CURRENT_TIMESTAMP WHERE file_name = %s",
+                            (count, file_name)
+                        )
+                        if file_name in self._entries:
+                            self._entries[file_name]['chunk_count'] = count
+
+    def files(self, file_type=None):
+        """Catalog entries, optionally restricted to one file type"""
+        self.refresh()
+        with self._lock:
+            return [
+                dict(entry) for entry in self._entries.values()
+                if file_type is None or entry['file_type'] == file_type
+            ]
@@ -0,0 +1,51 @@
+"""
+Slow Groq Stub Server
+Local stand-in for the Groq chat completions API, used to test
+admission control and the circuit breaker under an LLM brownout
+"""
+
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(delay, status):
+    """Build a request handler that answers after `delay` seconds with `status`"""
+
+    class GroqStubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            self.rfile.read(length)
+
+            time.sleep(delay)
+
+            if status != 200:
+                body = {"error": {"message": f"stub error {status}"}}
+            else:
+                body = {"choices": [{"message": {"content": "Réponse du stub Groq."}}]}
+
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            print(f"🐢 {self.address_string()} - {format % args}")
+
+    return GroqStubHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Slow Groq API stub")
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--delay', type=float, default=20.0, help="Seconds before answering")
+    parser.add_argument('--status', type=int, default=200, help="HTTP status to answer with")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(args.delay, args.status))
+    print(f"✅ Groq stub on http://127.0.0.1:{args.port}/ (delay={args.delay}s, status={args.status})")
+    print(f"   Run the app with GROQ_URL=http://127.0.0.1:{args.port}/")
+    server.serve_forever()
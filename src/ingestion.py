@@ -0,0 +1,308 @@
+"""
+Background Ingestion
+Worker pool that extracts, chunks, embeds and inserts uploaded documents
+while the Flask app keeps serving chat traffic
+"""
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import PyPDF2
+import psycopg2
+
+from .dedup import deduplicate_chunks, match_existing
+from .file_catalog import CATALOG_EXTENSIONS, document_date, read_text_file
+
+
+CHUNK_SIZE = 500
+MAX_RETAINED_JOBS = 100
+
+
+def load_document(file_path):
+    """Extract the text of a .txt or .pdf file as a document dict"""
+    file_type = CATALOG_EXTENSIONS[os.path.splitext(file_path)[1].lower()]
+
+    if file_type == 'pdf':
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            pages = [page.extract_text() or "" for page in pdf_reader.pages]
+        content = "\n".join(text for text in pages if text.strip())
+    else:
+        content, _ = read_text_file(file_path)
+        content = (content or "").strip()
+
+    return {
+        'file': os.path.basename(file_path),
+        'content': content,
+        'type': file_type,
+        'date': document_date(file_path)
+    }
+
+
+def chunk_document(doc, chunk_size=CHUNK_SIZE):
+    """Split a document into fixed-size chunks, same as create_db.py"""
+    content = doc['content']
+    return [
+        {'text': content[i:i + chunk_size], 'file': doc['file'], 'type': doc['type'], 'date': doc['date']}
+        for i in range(0, len(content), chunk_size)
+        if content[i:i + chunk_size].strip()
+    ]
+
+
+def remove_file_references(cursor, file_names):
+    """
+    Drop re-uploaded files from the index without touching other files' content.
+
+    Deduplicated rows can belong to several files, so the names are removed
+    from source_files (with their aligned source_types / source_dates); a row
+    is deleted only when no source file is left, and rows whose canonical file
+    was removed are re-attributed to a remaining one. Returns every other file
+    name that shared a row with the removed files.
+    """
+    cursor.execute(
+        "SELECT DISTINCT unnest(source_files) FROM embeddings WHERE source_files && %s::text[]",
+        (file_names,)
+    )
+    affected_files = {row[0] for row in cursor.fetchall()}
+
+    # Rebuild the three aligned arrays without the removed files
+    cursor.execute(
+        """
+        UPDATE embeddings AS e
+        SET source_files = kept.files, source_types = kept.types, source_dates = kept.dates
+        FROM (
+            SELECT id,
+                   array_agg(source_file ORDER BY position) AS files,
+                   array_agg(source_type ORDER BY position) AS types,
+                   array_agg(source_date ORDER BY position) AS dates
+            FROM embeddings,
+                 unnest(source_files, source_types, source_dates)
+                     WITH ORDINALITY AS s(source_file, source_type, source_date, position)
+            WHERE source_files && %s::text[] AND source_file <> ALL(%s::text[])
+            GROUP BY id
+        ) AS kept
+        WHERE e.id = kept.id
+        """,
+        (file_names, file_names)
+    )
+    # Rows still referencing a removed file had no other source file left
+    cursor.execute("DELETE FROM embeddings WHERE source_files && %s::text[]", (file_names,))
+    cursor.execute(
+        """
+        UPDATE embeddings
+        SET file_name = source_files[1], file_type = source_types[1], document_date = source_dates[1]
+        WHERE file_name = ANY(%s)
+        """,
+        (file_names,)
+    )
+    return affected_files - set(file_names)
+
+
+def add_file_references(cursor, existing_id, chunk):
+    """Append a new chunk's source files to the indexed row it duplicates"""
+    cursor.execute(
+        "SELECT source_files, source_types, source_dates FROM embeddings WHERE id = %s FOR UPDATE",
+        (existing_id,)
+    )
+    source_files, source_types, source_dates = (list(values or []) for values in cursor.fetchone())
+    for file_name, file_type, file_date in zip(chunk['source_files'], chunk['source_types'], chunk['source_dates']):
+        if file_name not in source_files:
+            source_files.append(file_name)
+            source_types.append(file_type)
+            source_dates.append(file_date)
+    cursor.execute(
+        "UPDATE embeddings SET source_files = %s, source_types = %s, source_dates = %s WHERE id = %s",
+        (source_files, source_types, source_dates, existing_id)
+    )
+    return source_files
+
+
+def parse_vector(value):
+    """Parse a pgvector/FLOAT8[] value returned as a string"""
+    if isinstance(value, str):
+        return [float(x) for x in value.strip('[]{}').split(',')]
+    return value
+
+
+def find_existing_duplicates(cursor, chunks, embeddings):
+    """For each new chunk, the id of an indexed row it near-duplicates (or None)"""
+    cursor.execute("SELECT id, embedding FROM embeddings")
+    rows = cursor.fetchall()
+
+    def texts_for(ids):
+        cursor.execute("SELECT id, corpus FROM embeddings WHERE id = ANY(%s)", (ids,))
+        return dict(cursor.fetchall())
+
+    return match_existing(
+        chunks, embeddings,
+        [row[0] for row in rows], [parse_vector(row[1]) for row in rows],
+        texts_for
+    )
+
+
+def count_chunks(cursor, file_names):
+    """Chunk count per file, counting every row that lists the file in source_files"""
+    file_names = list(file_names)
+    cursor.execute(
+        """
+        SELECT source_file, COUNT(*) FROM embeddings, unnest(source_files) AS source_file
+        WHERE source_file = ANY(%s) GROUP BY source_file
+        """,
+        (file_names,)
+    )
+    chunk_counts = {name: 0 for name in file_names}
+    chunk_counts.update(dict(cursor.fetchall()))
+    return chunk_counts
+
+
+class IngestionQueue:
+    """
+    Background ingestion jobs on a small worker pool.
+
+    Embedding is done in batches; after each batch the worker sleeps so that
+    it uses at most (1 - serving_cpu_share) of the time, leaving the rest of
+    the CPU to the embedding model on the request path.
+
+    With a data_folder, submitted files are staged copies: they are moved
+    into data_folder only once the job's transaction has committed, and
+    their staging directory is removed whether the job succeeds or fails.
+    """
+
+    def __init__(self, model, connection_str, file_catalog=None, data_folder=None,
+                 max_workers=1, batch_size=32, serving_cpu_share=0.5):
+        self.model = model
+        self.connection_str = connection_str
+        self.file_catalog = file_catalog
+        self.data_folder = data_folder
+        self.batch_size = batch_size
+        self.serving_cpu_share = min(max(serving_cpu_share, 0.0), 0.95)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, file_paths):
+        """Queue files for ingestion, return the job id"""
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "files": [os.path.basename(p) for p in file_paths],
+            "chunks_total": 0,
+            "chunks_done": 0,
+            "duplicates_removed": 0,
+            "chunks_per_second": 0.0,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._trim_jobs()
+        self._executor.submit(self._run, job_id, list(file_paths))
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def jobs(self):
+        with self._lock:
+            return [dict(job) for job in reversed(list(self._jobs.values()))]
+
+    def _trim_jobs(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("done", "failed")]
+        while len(self._jobs) > MAX_RETAINED_JOBS and finished:
+            del self._jobs[finished.pop(0)]
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _throttle(self, busy_seconds):
+        """Sleep so ingestion keeps at most (1 - serving_cpu_share) of the time"""
+        if self.serving_cpu_share > 0:
+            time.sleep(busy_seconds * self.serving_cpu_share / (1 - self.serving_cpu_share))
+
+    def _run(self, job_id, file_paths):
+        started = time.monotonic()
+        self._update(job_id, status="running", started_at=datetime.now().isoformat())
+
+        try:
+            chunks = []
+            for file_path in file_paths:
+                chunks.extend(chunk_document(load_document(file_path)))
+            chunks_total = len(chunks)
+            self._update(job_id, chunks_total=chunks_total)
+
+            embeddings = []
+            for i in range(0, len(chunks), self.batch_size):
+                batch_start = time.monotonic()
+                batch = [c['text'] for c in chunks[i:i + self.batch_size]]
+                embeddings.extend(self.model.encode(batch, convert_to_numpy=True))
+                elapsed = time.monotonic() - started
+                self._update(
+                    job_id,
+                    chunks_done=len(embeddings),
+                    chunks_per_second=round(len(embeddings) / elapsed, 2) if elapsed > 0 else 0.0
+                )
+                self._throttle(time.monotonic() - batch_start)
+
+            chunks, embeddings, removed = deduplicate_chunks(chunks, embeddings)
+            self._update(job_id, duplicates_removed=removed)
+
+            file_names = [os.path.basename(p) for p in file_paths]
+            with psycopg2.connect(self.connection_str) as conn:
+                with conn.cursor() as cur:
+                    affected_files = remove_file_references(cur, file_names)
+
+                    # Chunks that duplicate rows already indexed only add a back-reference
+                    matches = find_existing_duplicates(cur, chunks, embeddings)
+                    for chunk, existing_id in zip(chunks, matches):
+                        if existing_id is not None:
+                            affected_files.update(add_file_references(cur, existing_id, chunk))
+                    removed += sum(1 for m in matches if m is not None)
+                    self._update(job_id, duplicates_removed=removed)
+
+                    for chunk, embedding, existing_id in zip(chunks, embeddings, matches):
+                        if existing_id is not None:
+                            continue
+                        cur.execute(
+                            """
+                            INSERT INTO embeddings
+                                (corpus, embedding, file_name, file_type, document_date,
+                                 source_files, source_types, source_dates)
+                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                            """,
+                            (chunk['text'], embedding.tolist(), chunk['file'], chunk['type'], chunk['date'],
+                             chunk['source_files'], chunk['source_types'], chunk['source_dates'])
+                        )
+                    chunk_counts = count_chunks(cur, affected_files | set(file_names))
+
+            if self.data_folder is not None:
+                for file_path, file_name in zip(file_paths, file_names):
+                    os.replace(file_path, os.path.join(self.data_folder, file_name))
+
+            if self.file_catalog is not None:
+                self.file_catalog.set_chunk_counts(chunk_counts)
+
+            elapsed = time.monotonic() - started
+            self._update(
+                job_id,
+                status="done",
+                chunks_done=chunks_total,
+                chunks_per_second=round(chunks_total / elapsed, 2) if elapsed > 0 else 0.0,
+                finished_at=datetime.now().isoformat()
+            )
+        except Exception as e:
+            self._update(job_id, status="failed", error=str(e), finished_at=datetime.now().isoformat())
+        finally:
+            if self.data_folder is not None:
+                for staging_dir in {os.path.dirname(p) for p in file_paths}:
+                    shutil.rmtree(staging_dir, ignore_errors=True)
@@ -0,0 +1,109 @@
+"""
+Sampling Request Profiler
+Samples the call stack of a request thread at a fixed interval and writes
+collapsed stacks (flamegraph.pl / speedscope "folded" format) per endpoint
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+
+def frame_name(code):
+    """Flame-graph frame label: function (file:line)"""
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProfileSession:
+    """Stack samples of one request thread, collected by a daemon sampler thread"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self.duration = None
+        self._stop = threading.Event()
+        self._stop_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        """Stop sampling; safe to call more than once"""
+        with self._stop_lock:
+            if self._stop.is_set():
+                return
+            self.duration = time.perf_counter() - self._start
+            self._stop.set()
+        self._thread.join()
+
+
+class RequestProfiler:
+    """
+    Starts sessions, appends folded stacks per endpoint and keeps recent results.
+
+    Each <endpoint>.folded file is rotated to <endpoint>.folded.1 once it
+    exceeds max_file_bytes, so disk use stays bounded per endpoint.
+    """
+
+    def __init__(self, output_dir, interval=0.005, keep=200, max_file_bytes=10 * 1024 * 1024):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.max_file_bytes = max_file_bytes
+        self._recent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def start(self, thread_id):
+        return ProfileSession(thread_id, self.interval)
+
+    def finish(self, session, endpoint, method, path, status):
+        """Stop sampling and record the profile of one request"""
+        session.stop()
+
+        if session.stacks:
+            folded = "".join(f"{stack} {count}\n" for stack, count in session.stacks.items())
+            with self._lock:
+                os.makedirs(self.output_dir, exist_ok=True)
+                folded_path = os.path.join(self.output_dir, f"{endpoint}.folded")
+                if os.path.exists(folded_path) and os.path.getsize(folded_path) >= self.max_file_bytes:
+                    os.replace(folded_path, folded_path + ".1")
+                with open(folded_path, 'a', encoding='utf-8') as f:
+                    f.write(folded)
+
+        # Leaf frames with the most samples: where the time actually went
+        leaves = Counter()
+        for stack, count in session.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+
+        record = {
+            "endpoint": endpoint,
+            "method": method,
+            "path": path,
+            "status": status,
+            "started_at": session.started_at.isoformat(),
+            "duration_ms": round(session.duration * 1000, 1),
+            "samples": sum(session.stacks.values()),
+            "hot_frames": [{"frame": frame, "samples": count} for frame, count in leaves.most_common(5)]
+        }
+        with self._lock:
+            self._recent.append(record)
+
+    def slowest(self, limit=20):
+        """Slowest of the recently profiled requests"""
+        with self._lock:
+            records = list(self._recent)
+        return sorted(records, key=lambda r: r["duration_ms"], reverse=True)[:limit]